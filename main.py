@@ -1,12 +1,21 @@
 from fastapi import FastAPI, HTTPException, Query
 import httpx
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+import soupsieve as sv
+from selectolax.lexbor import LexborHTMLParser
 import uvicorn
 import os
+import ssl
 from urllib.parse import unquote, urlparse, parse_qs
 from contextlib import asynccontextmanager
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from contextvars import ContextVar
+import time
 import re
+import math
+import random
 import logging
 import sys
 
@@ -29,14 +38,79 @@ logger = logging.getLogger("PDALifeScraper")
 BASE_DOMAIN = "https://pdalife.com"
 CDN_DOMAIN = "https://mobdisc.com"
 
+# Connection pool HTTPX
+HTTP_MAX_CONNECTIONS = 1000
+HTTP_MAX_KEEPALIVE = 100
+
+# Batas jumlah item yang diproses bersamaan (tiap item melakukan fetch berurutan).
+# Mencegah ledakan request paralel yang memicu 429 dari server.
+ITEM_CONCURRENCY = 16
+# Dibuat di lifespan agar terikat ke event loop yang dipakai Uvicorn
+# (di Python 3.9, Semaphore yang dibuat saat import terikat ke loop lain).
+ITEM_SEMAPHORE = None
+# Cadangan di search: jika hasil belum lengkap setelah ITEM_HEDGE_DELAY detik,
+# jalankan hingga ITEM_HEDGE_MARGIN kandidat tambahan.
+ITEM_HEDGE_DELAY = 8.0
+ITEM_HEDGE_MARGIN = 2
+
+# Retry fetch: jumlah percobaan maksimum dan batas atas jeda backoff (detik)
+FETCH_MAX_ATTEMPTS = 6
+FETCH_MAX_BACKOFF = 30.0
+
+# Cache hasil scan CDN (dwn_url -> URL MobDisc final). Banyak versi aplikasi
+# sering menunjuk ke halaman download yang sama.
+CDN_CACHE_TTL = 300.0
+CDN_CACHE_MAX_SIZE = 1024
+CDN_INFLIGHT = {}  # dwn_url -> asyncio.Task yang sedang berjalan
+CDN_RESULT_CACHE = OrderedDict()  # dwn_url -> (timestamp, final_url), urutan LRU
+
+# Pesan halaman search kosong; dicek langsung pada bytes response (tanpa parsing)
+SEARCH_EMPTY_MARKER = b"Found 0 responses"
+# Sentinel hasil fetch: response mengandung `empty_marker`, halaman tidak di-parse
+EMPTY_PAGE = object()
+
+# Cache fetch per request /search: (url, strainer) -> Task hasil fetch.
+# Di luar /search nilainya None (cache tidak aktif).
+SEARCH_FETCH_CACHE: ContextVar = ContextVar("search_fetch_cache", default=None)
+# Task bersama (cache fetch & scan CDN) yang dipakai oleh request /search saat ini.
+# Saat request selesai, task yang tidak lagi dipakai request lain dibatalkan.
+SEARCH_TASKS: ContextVar = ContextVar("search_tasks", default=None)
+SHARED_TASK_USERS = {}  # task -> jumlah request /search yang memakainya
+
+# Parse hanya fragmen HTML yang benar-benar dipakai (hemat CPU & memori).
+# Catatan: tag yang cocok disimpan beserta seluruh isinya (children).
+# (Halaman search tidak memakai strainer karena di-parse dengan selectolax.)
+DETAIL_STRAINER = SoupStrainer(
+    class_=re.compile(r'game-versions__downloads-list|game-versions__downloads-button|accordion-item')
+)
+CDN_STRAINER = SoupStrainer('a', class_=re.compile(r'b-download__button'))
+
+# CSS selector yang di-compile sekali saat load (tidak di-parse ulang per pemanggilan)
+CDN_BTN_SEL = sv.compile('a.b-download__button')
+SIZE_SEL = sv.compile('.game-versions__downloads-size')
+
+# Selector halaman search (selectolax). Lexbor tidak punya objek selector ter-compile,
+# jadi cukup disimpan sebagai konstanta di satu tempat.
+CATALOG_SEL = '.catalog-item'
+CATALOG_FIELDS_SEL = '.catalog-item__title a, .catalog-item__poster img'
+LOAD_MORE_SEL = '.js-load_more'
+
 # Setup Async Client
 client = None
 
+# Thread pool khusus parsing HTML (dibuat di lifespan), terpisah dari default executor.
+# Tujuannya mengisolasi kerja parsing agar tidak berebut dengan pemakai default executor
+# lain; bukan paralelisme penuh (tree builder BS4 tetap memanggil Python per elemen).
+PARSE_POOL = None
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global client
+    global client, PARSE_POOL, ITEM_SEMAPHORE
     logger.info("Starting application lifespan...")
     
+    PARSE_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="html-parse")
+    ITEM_SEMAPHORE = asyncio.Semaphore(ITEM_CONCURRENCY)
+    
     # Robust headers to avoid blocks
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -45,13 +119,27 @@ async def lifespan(app: FastAPI):
         "Accept-Language": "en-US,en;q=0.9",
     }
     
+    # SSLContext eksplisit; verifikasi sertifikat tetap dimatikan (setara verify=False).
+    ssl_context = ssl.create_default_context()
+    ssl_context.check_hostname = False
+    ssl_context.verify_mode = ssl.CERT_NONE
+    
     logger.info("Initializing HTTPX AsyncClient with custom headers.")
     # Using a standard AsyncClient with follow_redirects=True
+    # Pool besar + keep-alive panjang agar koneksi TLS ke pdalife/mobdisc dipakai ulang,
+    # dan HTTP/2 agar banyak request bisa multiplex di satu koneksi.
+    # Timeout per request agar satu request yang hang tidak menahan koneksi/slot selamanya.
     client = httpx.AsyncClient(
         headers=headers, 
-        verify=False, 
+        verify=ssl_context, 
         follow_redirects=True, 
-        timeout=None
+        timeout=httpx.Timeout(connect=5.0, read=15.0, write=5.0, pool=5.0),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=30.0
+        ),
+        http2=True
     )
     
     logger.info("Application startup complete. Ready to accept requests.")
@@ -59,7 +147,9 @@ async def lifespan(app: FastAPI):
     
     logger.info("Shutting down application. Closing HTTPX client.")
     await client.aclose()
-    logger.info("HTTPX client closed. Application stopped.")
+    logger.info("HTTPX client closed. Shutting down parse thread pool.")
+    PARSE_POOL.shutdown(wait=True, cancel_futures=True)
+    logger.info("Application stopped.")
     
 app = FastAPI(title="PDALife Scraper", lifespan=lifespan)
 
@@ -67,6 +157,11 @@ app = FastAPI(title="PDALife Scraper", lifespan=lifespan)
 # HELPER FUNCTIONS
 # ==========================================
 
+# Konstanta untuk unwrap_google_url (dipanggil untuk setiap URL)
+_NESTED_URL_RE = re.compile(r'(https?://[^&]+)')
+_TR_GOOG_MARKER = ".translate.goog"
+_TR_PARAM_MARKER = "_x_tr_"
+
 def unwrap_google_url(url: str) -> str:
     """
     Membersihkan URL dari wrapper Google Translate dan menangani Relative Path
@@ -75,6 +170,15 @@ def unwrap_google_url(url: str) -> str:
     if not url: return ""
     clean = unquote(url)
     
+    # Fast path: URL absolut biasa (tanpa wrapper translate / nesting) langsung dikembalikan
+    if (
+        _TR_GOOG_MARKER not in clean
+        and _TR_PARAM_MARKER not in clean
+        and not clean.startswith("/")
+        and not ("https://" in clean and "http" in clean[8:])
+    ):
+        return clean
+    
     # 1. Decode jika URL terbungkus format translate
     # Contoh: https://pdalife-com.translate.goog/...
     clean = clean.replace("-com.translate.goog", ".com")
@@ -94,19 +198,131 @@ def unwrap_google_url(url: str) -> str:
             return BASE_DOMAIN + clean
             
     # 4. Handle jika URL absolut tapi masih ada sisa-sisa google
+    # (dicek ulang setelah langkah 2, karena parameter _x_tr_ bisa mengandung "http")
     if "https://" in clean and "http" in clean[8:]:
         # Kadang google nesting url: https://google.com/url?q=https://...
-        match = re.search(r'(https?://[^&]+)', clean)
+        match = _NESTED_URL_RE.search(clean)
         if match:
             return match.group(1)
 
     return clean
 
-async def fetch_until_success(url: str, validator_func) -> BeautifulSoup:
+def backoff_delay(attempt: int, res: httpx.Response = None) -> float:
+    """
+    Hitung jeda sebelum retry: exponential backoff + jitter.
+    Jika server mengirim header Retry-After (detik), nilai itu yang dipakai.
+    """
+    if res is not None:
+        retry_after = res.headers.get("retry-after", "").strip()
+        if retry_after.isdigit():
+            return min(FETCH_MAX_BACKOFF, float(retry_after))
+    return min(FETCH_MAX_BACKOFF, 0.5 * 2 ** attempt) + random.random() * 0.3
+
+# Jenis link download (hasil classify_link)
+LINK_MAGNET = 0
+LINK_INTERNAL = 1  # /dwn/... atau link pdalife.com (termasuk relative path)
+LINK_EXTERNAL = 2  # link http ke domain lain (mis. onlinerp.me)
+
+def classify_link(url: str) -> int:
+    """
+    Klasifikasikan link download sekali saja, daripada mengulang beberapa
+    pengecekan substring di dalam loop.
+    """
+    if url[:7] == "magnet:":
+        return LINK_MAGNET
+    if "pdalife.com" in url or "/dwn/" in url:
+        return LINK_INTERNAL
+    if "http" in url:
+        return LINK_EXTERNAL
+    return LINK_INTERNAL
+
+async def fetch_until_success(
+    url: str,
+    validator_func,
+    strainer: SoupStrainer = None,
+    max_attempts: int = FETCH_MAX_ATTEMPTS,
+    parser: str = "bs4",
+    empty_marker: bytes = None
+):
+    """
+    Wrapper fetch_page dengan coalescing: selama satu request /search,
+    URL yang sama hanya di-fetch & di-parse sekali.
+    """
+    cache = SEARCH_FETCH_CACHE.get()
+    if cache is None:
+        return await fetch_page(url, validator_func, strainer, max_attempts, parser, empty_marker)
+
+    key = (url, id(strainer), parser, empty_marker)
+    task = cache.get(key)
+    if task is None:
+        task = asyncio.ensure_future(
+            fetch_page(url, validator_func, strainer, max_attempts, parser, empty_marker)
+        )
+        cache[key] = task
+    track_search_task(task)
+    # shield: jika pemanggil di-cancel, pemanggil lain tetap mendapat hasilnya
+    return await asyncio.shield(task)
+
+def track_search_task(task: asyncio.Task):
+    """
+    Catat bahwa request /search saat ini memakai task bersama ini.
+    """
+    tasks = SEARCH_TASKS.get()
+    if tasks is None or task in tasks:
+        return
+    tasks.add(task)
+    SHARED_TASK_USERS[task] = SHARED_TASK_USERS.get(task, 0) + 1
+
+def release_search_tasks(tasks: set):
+    """
+    Lepas task bersama milik request /search yang sudah selesai. Task yang masih
+    berjalan dan tidak dipakai request lain dibatalkan agar tidak terus fetch di background.
+    """
+    for task in tasks:
+        users = SHARED_TASK_USERS.pop(task, 1) - 1
+        if users > 0:
+            SHARED_TASK_USERS[task] = users
+        elif not task.done():
+            # Keluarkan dari CDN_INFLIGHT saat itu juga, jangan menunggu done callback,
+            # agar request lain tidak bergabung ke task yang sudah dibatalkan.
+            forget_cdn_task(task)
+            task.cancel()
+
+async def run_outside_search(coro):
+    """
+    Jalankan coroutine (di dalam task-nya sendiri) tanpa konteks /search,
+    agar task bersama tidak memegang cache fetch milik request yang membuatnya.
+    """
+    SEARCH_FETCH_CACHE.set(None)
+    SEARCH_TASKS.set(None)
+    return await coro
+
+def parse_html(content: bytes, encoding: str, parser: str, strainer: SoupStrainer = None):
+    """
+    Parse HTML dengan parser yang dipilih:
+    - "bs4": BeautifulSoup + lxml (dipakai untuk pipeline detail/CDN)
+    - "selectolax": Lexbor (C), jauh lebih cepat untuk sekadar mengambil beberapa field
+    """
+    if parser == "selectolax":
+        return LexborHTMLParser(content)
+    return BeautifulSoup(content, 'lxml', from_encoding=encoding, parse_only=strainer)
+
+async def fetch_page(
+    url: str,
+    validator_func,
+    strainer: SoupStrainer = None,
+    max_attempts: int = FETCH_MAX_ATTEMPTS,
+    parser: str = "bs4",
+    empty_marker: bytes = None
+):
     """
     Mencoba fetch URL. 
-    MODIFIED (FULL ASYNC): Parsing BeautifulSoup dipindah ke thread terpisah
+    MODIFIED (FULL ASYNC): Parsing HTML dipindah ke thread terpisah
     untuk menghindari blocking pada event loop.
+    Mengembalikan BeautifulSoup, atau LexborHTMLParser jika parser="selectolax".
+    Jika `strainer` diberikan, hanya tag yang cocok yang di-parse (khusus bs4).
+    Retry dibatasi `max_attempts` kali dengan exponential backoff di antaranya.
+    Jika `empty_marker` ditemukan di bytes response, parsing dilewati dan EMPTY_PAGE dikembalikan.
     """
     target_url = url
     if target_url.startswith("/"):
@@ -114,15 +330,15 @@ async def fetch_until_success(url: str, validator_func) -> BeautifulSoup:
 
     logger.info(f"Initiating fetch request for URL: {target_url}")
 
-    attempt_count = 0
-    while True:
-        attempt_count += 1
+    for attempt_count in range(1, max_attempts + 1):
         try:
             res = await client.get(target_url)
             
             # Handle 429 Too Many Requests atau Server Error -> RETRY
             if res.status_code == 429 or res.status_code >= 500:
-                logger.warning(f"Received status {res.status_code} for {target_url}. Retrying (Attempt {attempt_count})...")
+                logger.warning(f"Received status {res.status_code} for {target_url}. Retrying (Attempt {attempt_count}/{max_attempts})...")
+                if attempt_count < max_attempts:
+                    await asyncio.sleep(backoff_delay(attempt_count, res))
                 continue
                 
             # Handle Blocked/Legal Content (451, 403)
@@ -135,11 +351,22 @@ async def fetch_until_success(url: str, validator_func) -> BeautifulSoup:
                 logger.error(f"URL not found (404): {target_url}")
                 return None
 
+            # Fast path: halaman "kosong" cukup dicek dengan substring pada bytes,
+            # tidak perlu membangun tree lalu walk seluruh teksnya.
+            body = res.content
+            if empty_marker and empty_marker in body:
+                logger.info(f"Empty-result marker found for: {target_url}")
+                return EMPTY_PAGE
+
             # === FULL ASYNC MODIFICATION START ===
             # Operasi parsing BeautifulSoup adalah operasi blocking (CPU-bound).
-            # Kita jalankan di thread terpisah agar tidak memblokir event loop asyncio.
+            # Kita jalankan di thread terpisah (PARSE_POOL) agar tidak memblokir event loop asyncio.
             # Menggunakan res.content (bytes) agar decoding dilakukan di dalam thread juga.
-            soup = await asyncio.to_thread(BeautifulSoup, res.content, 'html.parser')
+            # Parser 'lxml' (libxml2, C) jauh lebih cepat dibanding 'html.parser'.
+            # Encoding dari response diteruskan langsung agar BS4 tidak perlu auto-detect.
+            soup = await asyncio.get_running_loop().run_in_executor(
+                PARSE_POOL, parse_html, body, res.encoding, parser, strainer
+            )
             # === FULL ASYNC MODIFICATION END ===
             
             # Cek apakah HTML valid sesuai kriteria
@@ -149,7 +376,9 @@ async def fetch_until_success(url: str, validator_func) -> BeautifulSoup:
             
             # Khusus kasus MobDisc: Redirect terjadi otomatis oleh HTTPX.
             # Jadi kita cek apakah content mengandung ciri khas MobDisc
-            if "mobdisc" in str(res.url) or soup.select('a.b-download__button'):
+            # (cek host dulu: murah, tanpa perlu walk tree)
+            is_mobdisc = "mobdisc" in res.url.host
+            if parser == "bs4" and (is_mobdisc or CDN_BTN_SEL.select_one(soup)):
                  logger.info(f"MobDisc content detected for: {target_url}")
                  return soup
 
@@ -158,12 +387,27 @@ async def fetch_until_success(url: str, validator_func) -> BeautifulSoup:
             if res.status_code == 200:
                 logger.warning(f"Fetched {target_url} with status 200, but validation failed (content missing). Stopping retry.")
                 return None
+
+            logger.warning(f"Unexpected status {res.status_code} for {target_url}. Retrying (Attempt {attempt_count}/{max_attempts})...")
+            if attempt_count < max_attempts:
+                await asyncio.sleep(backoff_delay(attempt_count, res))
+                 
+        except httpx.TimeoutException as e:
+            # Timeout (connect/read/write/pool) -> RETRY dengan backoff
+            logger.warning(f"Timeout ({type(e).__name__}) while fetching {target_url}. Retrying (Attempt {attempt_count}/{max_attempts})...")
+            if attempt_count < max_attempts:
+                await asyncio.sleep(backoff_delay(attempt_count))
+            continue
                  
         except Exception as e:
-            # MODIFIED: Biarin aja (continue), jangan sleep.
-            logger.error(f"Exception occurred while fetching {target_url}: {str(e)}. Retrying (Attempt {attempt_count})...")
+            # Beri jeda (backoff) agar server sempat pulih dan event loop
+            # bisa menjalankan task lain, bukan retry langsung.
+            logger.error(f"Exception occurred while fetching {target_url}: {str(e)}. Retrying (Attempt {attempt_count}/{max_attempts})...")
+            if attempt_count < max_attempts:
+                await asyncio.sleep(backoff_delay(attempt_count))
             continue
     
+    logger.error(f"Giving up on {target_url} after {max_attempts} attempts.")
     return None
 
 # ==========================================
@@ -171,6 +415,50 @@ async def fetch_until_success(url: str, validator_func) -> BeautifulSoup:
 # ==========================================
 
 async def scan_cdn_page_loop(dwn_url: str) -> str:
+    """
+    Wrapper scan_cdn_page dengan cache TTL + coalescing request yang sedang berjalan,
+    sehingga dwn_url yang sama tidak di-fetch & di-parse berulang kali.
+    """
+    cached = CDN_RESULT_CACHE.get(dwn_url)
+    if cached:
+        cached_at, cached_url = cached
+        if time.monotonic() - cached_at < CDN_CACHE_TTL:
+            CDN_RESULT_CACHE.move_to_end(dwn_url)
+            logger.info(f"CDN cache hit for: {dwn_url}")
+            return cached_url
+        del CDN_RESULT_CACHE[dwn_url]
+
+    task = CDN_INFLIGHT.get(dwn_url)
+    # Task yang sudah selesai/dibatalkan (done callback belum jalan) dianggap cache miss
+    if task is None or task.done():
+        task = asyncio.ensure_future(run_outside_search(scan_cdn_page(dwn_url)))
+        CDN_INFLIGHT[dwn_url] = task
+        task.add_done_callback(lambda t: forget_cdn_task(t, dwn_url))
+    else:
+        logger.info(f"Joining in-flight CDN scan for: {dwn_url}")
+    track_search_task(task)
+    return await asyncio.shield(task)
+
+def forget_cdn_task(task: asyncio.Task, dwn_url: str = None):
+    """
+    Hapus task dari CDN_INFLIGHT, hanya jika entry tersebut memang task ini
+    (bukan task baru untuk dwn_url yang sama).
+    """
+    if dwn_url is None:
+        dwn_url = next((url for url, t in CDN_INFLIGHT.items() if t is task), None)
+    if dwn_url is not None and CDN_INFLIGHT.get(dwn_url) is task:
+        del CDN_INFLIGHT[dwn_url]
+
+def cache_cdn_result(dwn_url: str, final_url: str):
+    """
+    Simpan hasil scan CDN yang berhasil, buang entry terlama jika cache penuh.
+    """
+    CDN_RESULT_CACHE[dwn_url] = (time.monotonic(), final_url)
+    CDN_RESULT_CACHE.move_to_end(dwn_url)
+    while len(CDN_RESULT_CACHE) > CDN_CACHE_MAX_SIZE:
+        CDN_RESULT_CACHE.popitem(last=False)
+
+async def scan_cdn_page(dwn_url: str) -> str:
     """
     Logika pengambilan link dari MobDisc berdasarkan HTML yang diberikan.
     Diperbarui untuk mengembalikan URL direct MobDisc (dw...) 
@@ -180,11 +468,11 @@ async def scan_cdn_page_loop(dwn_url: str) -> str:
     
     def is_valid_mobdisc_page(soup):
         # Berdasarkan HTMLmu: tombol download memiliki class 'b-download__button'
-        return bool(soup.select('a.b-download__button'))
+        return CDN_BTN_SEL.select_one(soup) is not None
 
     # dwn_url awalnya adalah https://pdalife.com/dwn/xxxx
     # Ini akan redirect ke https://mobdisc.com/dw....
-    soup = await fetch_until_success(dwn_url, is_valid_mobdisc_page)
+    soup = await fetch_until_success(dwn_url, is_valid_mobdisc_page, CDN_STRAINER)
     
     if not soup:
         logger.warning(f"Failed to retrieve valid CDN page content for: {dwn_url}")
@@ -194,6 +482,7 @@ async def scan_cdn_page_loop(dwn_url: str) -> str:
     # Ini adalah link yang user inginkan (https://mobdisc.com/dw...)
     # Kami mencoba mencarinya dari URL final setelah redirect.
     final_mobdisc_url = dwn_url
+    resolved = False
     
     # Jika dwn_url adalah link /dwn/ di pdalife, kita butuh URL MobDisc aslinya.
     # Karena fetch_until_success menggunakan follow_redirects=True, 
@@ -203,12 +492,21 @@ async def scan_cdn_page_loop(dwn_url: str) -> str:
         head_res = await client.head(dwn_url)
         if head_res.status_code in [301, 302] and 'location' in head_res.headers:
             final_mobdisc_url = head_res.headers['location']
+            resolved = True
         elif head_res.status_code == 200:
             final_mobdisc_url = str(head_res.url)
-    except:
+            resolved = True
+    except Exception:
+        # (CancelledError tidak ditangkap: task dibatalkan oleh release_search_tasks)
         pass
 
-    return unwrap_google_url(final_mobdisc_url)
+    final_mobdisc_url = unwrap_google_url(final_mobdisc_url)
+    # Hanya cache jika HEAD benar-benar menghasilkan URL final
+    if resolved:
+        cache_cdn_result(dwn_url, final_mobdisc_url)
+    else:
+        logger.warning(f"Could not resolve final MobDisc URL for: {dwn_url}")
+    return final_mobdisc_url
 
 async def process_item_fully(name, detail_url, image):
     """
@@ -217,11 +515,18 @@ async def process_item_fully(name, detail_url, image):
     logger.info(f"Processing item: {name} | URL: {detail_url}")
     try:
         # 1. Validasi Halaman Detail
+        # Hasil find_all di validator disimpan agar tidak perlu walk tree lagi di langkah 2
+        validated = {}
+
         def detail_page_valid(s):
             # Cari tombol download di accordion
-            return bool(s.select('a.game-versions__downloads-button')) or bool(s.select('.accordion-item'))
+            buttons = s.find_all('a', class_='game-versions__downloads-button')
+            validated["soup"] = s
+            validated["buttons"] = buttons
+            # find() berhenti di match pertama (short-circuit)
+            return bool(buttons or s.find(class_='accordion-item'))
         
-        app_soup = await fetch_until_success(detail_url, detail_page_valid)
+        app_soup = await fetch_until_success(detail_url, detail_page_valid, DETAIL_STRAINER)
         if not app_soup:
             logger.error(f"Failed to load detail page for: {name}")
             return None
@@ -229,25 +534,39 @@ async def process_item_fully(name, detail_url, image):
         # 2. Ambil SEMUA elemen download yang tersedia
         link_items = []
         
-        # Coba ambil dari list accordion (biasanya ada banyak versi)
-        download_list_items = app_soup.select('.game-versions__downloads-list li')
+        # Satu kali tree walk: ambil semua tombol download, lalu pisahkan
+        # yang berada di dalam list accordion (biasanya ada banyak versi).
+        # Pakai ulang hasil validator; soup bisa berasal dari cache fetch milik task lain.
+        if validated.get("soup") is app_soup:
+            all_buttons = validated["buttons"]
+        else:
+            all_buttons = app_soup.find_all('a', class_='game-versions__downloads-button')
         
-        if download_list_items:
-            for item in download_list_items:
-                btn = item.select_one('a.game-versions__downloads-button')
-                size_tag = item.select_one('.game-versions__downloads-size')
-                if btn:
-                    link_items.append({
-                        "tag": btn,
-                        "size": size_tag.get_text(strip=True) if size_tag else ""
-                    })
+        listed_buttons = []
+        seen_list_items = set()
+        for btn in all_buttons:
+            list_item = btn.find_parent('li')
+            if list_item is None or id(list_item) in seen_list_items:
+                continue
+            if list_item.find_parent(class_='game-versions__downloads-list') is None:
+                continue
+            # Hanya tombol pertama per <li>, sama seperti select_one per item
+            seen_list_items.add(id(list_item))
+            listed_buttons.append((btn, list_item))
+        
+        if listed_buttons:
+            for btn, list_item in listed_buttons:
+                size_tag = SIZE_SEL.select_one(list_item)
+                link_items.append({
+                    "tag": btn,
+                    "size": size_tag.get_text(strip=True) if size_tag else ""
+                })
         else:
             # Fallback: jika tidak ada list, coba ambil semua tombol download yang terlihat
             logger.info(f"No download list found for {name}, trying standalone buttons.")
-            fallback_buttons = app_soup.select('a.game-versions__downloads-button')
-            for btn in fallback_buttons:
+            for btn in all_buttons:
                 # Cari size di parent atau tetangga jika standalone
-                size_tag = btn.select_one('.game-versions__downloads-size')
+                size_tag = SIZE_SEL.select_one(btn)
                 link_items.append({
                     "tag": btn,
                     "size": size_tag.get_text(strip=True) if size_tag else ""
@@ -269,10 +588,11 @@ async def process_item_fully(name, detail_url, image):
             raw_link = link_tag.get('href')
             
             if not raw_link: continue
+            link_kind = classify_link(raw_link)
 
             # === MODIFIKASI DIMULAI DARI SINI ===
             # Handle Magnet Link: Langsung simpan tanpa fetch/scan
-            if raw_link.startswith("magnet:"):
+            if link_kind == LINK_MAGNET:
                 logger.info(f"Magnet link detected for {name} [{index}]. Adding directly.")
                 final_links.append(raw_link)
                 final_sizes.append(item_size)
@@ -282,7 +602,7 @@ async def process_item_fully(name, detail_url, image):
             processed_link = None
             
             # Check if it's a direct external link (like onlinerp.me)
-            if "http" in raw_link and "pdalife.com" not in raw_link and "/dwn/" not in raw_link:
+            if link_kind == LINK_EXTERNAL:
                 logger.info(f"External link detected for {name} [{index}]. Attempting to scan target: {raw_link}")
                 direct_link = await scan_cdn_page_loop(raw_link)
                 if direct_link:
@@ -327,6 +647,13 @@ async def process_item_fully(name, detail_url, image):
         logger.error(f"Exception processing item {name}: {str(e)}")
         return None
 
+async def process_item_guarded(name, detail_url, image):
+    """
+    Wrapper process_item_fully yang dibatasi oleh ITEM_SEMAPHORE.
+    """
+    async with ITEM_SEMAPHORE:
+        return await process_item_fully(name, detail_url, image)
+
 # ==========================================
 # ENDPOINTS
 # ==========================================
@@ -339,6 +666,58 @@ async def root():
         "example_usage": "/search?query=minecraft&limit=5"
     }
 
+def search_page_url(query: str, page: int) -> str:
+    """
+    Construct Search URL per Page.
+    """
+    if page == 1:
+        return f"{BASE_DOMAIN}/search/{query}"
+    return f"{BASE_DOMAIN}/search/{query}/page-{page}/"
+
+def parse_catalog_item(node) -> tuple:
+    """
+    Ambil (name, detail_link, image) dari satu node .catalog-item.
+    Judul dan poster diambil dengan SATU query CSS (urutan dokumen), bukan dua.
+    Mengembalikan None jika item tidak punya link judul.
+    """
+    title_el = None
+    img_el = None
+    for el in node.css(CATALOG_FIELDS_SEL):
+        if el.tag == 'a':
+            if title_el is None:
+                title_el = el
+        elif img_el is None:
+            img_el = el
+    if not title_el:
+        return None
+
+    name = title_el.text(strip=True)
+    # Link detail (masih relative / wrapped)
+    detail_href = title_el.attributes.get('href') or ""
+    detail_link = unwrap_google_url(detail_href) # Bersihkan dulu biar jadi absolute pdalife.com
+    image = unwrap_google_url(img_el.attributes.get('src') or "") if img_el else ""
+    return (name, detail_link, image)
+
+def extract_search_page_items(tree: LexborHTMLParser, page: int) -> list:
+    """
+    Ambil semua item (name, detail_link, image) dari satu halaman search dalam satu pass.
+    Mengembalikan list kosong jika halaman gagal di-fetch atau tidak ada hasil.
+    """
+    # Check for empty result message (dideteksi dari bytes di fetch_page)
+    if tree is EMPTY_PAGE:
+        logger.info(f"Search found 0 responses on page {page}.")
+        return []
+
+    if not tree:
+        logger.warning(f"Pagination stopped. Could not fetch page {page}.")
+        return []
+
+    # Get items on current page
+    page_items = [entry for entry in map(parse_catalog_item, tree.css(CATALOG_SEL)) if entry]
+    if not page_items:
+        logger.info(f"No catalog items found on page {page}.")
+    return page_items
+
 @app.get("/search")
 async def search_apps(
     query: str = Query(..., description="App name"),
@@ -346,96 +725,151 @@ async def search_apps(
 ):
     logger.info(f"Search request received. Query: '{query}' | Limit: {limit}")
     
-    # Validator Search Page
+    # Aktifkan cache fetch khusus untuk request ini (ikut ter-copy ke task anak)
+    fetch_cache_token = SEARCH_FETCH_CACHE.set({})
+    search_tasks = set()
+    search_tasks_token = SEARCH_TASKS.set(search_tasks)
+    try:
+        return await run_search(query, limit)
+    finally:
+        # Request selesai / client disconnect: hentikan task bersama yang masih berjalan
+        release_search_tasks(search_tasks)
+        SEARCH_TASKS.reset(search_tasks_token)
+        SEARCH_FETCH_CACHE.reset(fetch_cache_token)
+
+async def run_search(query: str, limit: int):
+    """
+    Pipeline pencarian: kumpulkan item dari halaman search lalu proses detailnya.
+    """
+    # Tidak ada yang perlu diambil (sama seperti sebelumnya: tanpa fetch sama sekali)
+    if limit <= 0:
+        logger.info(f"Search finished. Limit {limit} requires no results for query '{query}'.")
+        return {"success": True, "count": 0, "results": []}
+    
+    # Validator Search Page (tree selectolax)
     def search_page_valid(s):
-        # Cek apakah ada item catalog atau pesan "Found 0"
-        return bool(s.select('.catalog-item')) or "Found 0 responses" in s.get_text()
+        # Cek apakah ada item catalog (pesan "Found 0" sudah ditangani oleh empty_marker)
+        return s.css_first(CATALOG_SEL) is not None
+
+    def fetch_search_page(page):
+        return fetch_until_success(
+            search_page_url(query, page),
+            search_page_valid,
+            parser="selectolax",
+            empty_marker=SEARCH_EMPTY_MARKER
+        )
 
     collected_item_elements = []
-    current_page = 1
     max_page = 1 # Default, will update from HTML if available
     
     # ---------------------------------------------------------
-    # PAGINATION LOOP START
+    # PAGINATION START
     # ---------------------------------------------------------
-    while len(collected_item_elements) < limit:
-        logger.info(f"Pagination: Fetching page {current_page} for query '{query}'")
-        
-        # Construct Search URL per Page
-        if current_page == 1:
-            search_url = f"{BASE_DOMAIN}/search/{query}"
-        else:
-            search_url = f"{BASE_DOMAIN}/search/{query}/page-{current_page}/"
-        
-        soup = await fetch_until_success(search_url, search_page_valid)
-        
-        if not soup:
-            logger.warning(f"Pagination stopped. Could not fetch page {current_page}.")
-            break
-
-        # Check for empty result message
-        if "Found 0 responses" in soup.get_text():
-            logger.info(f"Search found 0 responses on page {current_page}.")
-            break
-
-        # Get items on current page
-        page_items = soup.select('.catalog-item')
-        if not page_items:
-            logger.info(f"No catalog items found on page {current_page}.")
-            break
-            
+    # Halaman 1 di-fetch dulu untuk mengetahui max_page & jumlah item per halaman,
+    # setelah itu halaman sisanya di-fetch secara paralel.
+    logger.info(f"Pagination: Fetching page 1 for query '{query}'")
+    tree = await fetch_search_page(1)
+    page_items = extract_search_page_items(tree, 1)
+    
+    if page_items:
         collected_item_elements.extend(page_items)
-        logger.info(f"Collected {len(page_items)} items from page {current_page}. Total collected: {len(collected_item_elements)}")
+        logger.info(f"Collected {len(page_items)} items from page 1. Total collected: {len(collected_item_elements)}")
 
         # Check max pages from the "Load More" button data attributes
-        load_more_btn = soup.select_one('.js-load_more')
-        if load_more_btn and load_more_btn.has_attr('data-max_page'):
+        load_more_btn = tree.css_first(LOAD_MORE_SEL)
+        if load_more_btn and load_more_btn.attributes.get('data-max_page'):
             try:
-                max_page = int(load_more_btn['data-max_page'])
+                max_page = int(load_more_btn.attributes['data-max_page'])
                 logger.info(f"Max page detected: {max_page}")
             except:
                 pass
         
-        # Stop if we reached the last known page
-        if current_page >= max_page:
-            logger.info("Reached last known page. Stopping pagination.")
-            break
+        # Hitung berapa halaman yang dibutuhkan untuk memenuhi limit
+        needed_pages = min(max_page, math.ceil(limit / len(page_items)))
+        if needed_pages <= 1:
+            logger.info("Limit satisfied or reached last known page. Stopping pagination.")
+        else:
+            logger.info(f"Pagination: Fetching pages 2-{needed_pages} concurrently for query '{query}'")
+            trees = await asyncio.gather(*[
+                fetch_search_page(page)
+                for page in range(2, needed_pages + 1)
+            ])
             
-        current_page += 1
+            # Gabungkan sesuai urutan halaman; berhenti di halaman pertama yang gagal/kosong
+            for page, page_tree in enumerate(trees, start=2):
+                page_items = extract_search_page_items(page_tree, page)
+                if not page_items:
+                    break
+                collected_item_elements.extend(page_items)
+                logger.info(f"Collected {len(page_items)} items from page {page}. Total collected: {len(collected_item_elements)}")
+                if len(collected_item_elements) >= limit:
+                    break
     # ---------------------------------------------------------
-    # PAGINATION LOOP END
+    # PAGINATION END
     # ---------------------------------------------------------
 
     if not collected_item_elements:
         logger.info(f"Search finished. No items found for query '{query}'.")
         return {"success": True, "count": 0, "results": []}
 
-    # Slice to exact limit before processing to save resources
-    items_to_process = collected_item_elements[:limit]
-    logger.info(f"Starting concurrent processing for {len(items_to_process)} items.")
-    
-    tasks = []
-    # Loop items found
-    for item in items_to_process:
-        title_el = item.select_one('.catalog-item__title a')
-        if not title_el: continue
-        
-        name = title_el.get_text(strip=True)
-        # Link detail (masih relative / wrapped)
-        detail_href = title_el['href']
-        detail_link = unwrap_google_url(detail_href) # Bersihkan dulu biar jadi absolute pdalife.com
-        
-        img_el = item.select_one('.catalog-item__poster img')
-        image = unwrap_google_url(img_el['src']) if img_el else ""
-        
-        # Buat task async untuk memproses detail item ini
-        tasks.append(process_item_fully(name, detail_link, image))
+    # Item sudah berupa (name, detail_link, image) hasil extract_search_page_items
+    candidates = collected_item_elements
+
+    # Hanya `limit` item teratas yang diproses di awal untuk menghemat resource.
+    # Kandidat berikutnya dijalankan sebagai pengganti item yang gagal, atau sebagai
+    # cadangan (hedge, maks. ITEM_HEDGE_MARGIN) jika hasil belum lengkap setelah ITEM_HEDGE_DELAY.
+    logger.info(f"Starting concurrent processing for {min(limit, len(candidates))} items ({len(candidates)} candidates).")
+
+    next_candidate = iter(enumerate(candidates))
+    pending = {}  # task -> index kandidat (peringkat di hasil search)
+    results_by_index = {}
+    hedge_slots = 0
+    loop = asyncio.get_running_loop()
+    hedge_at = loop.time() + ITEM_HEDGE_DELAY
 
-    # Jalankan semua task secara paralel
-    results = await asyncio.gather(*tasks)
+    def launch_candidates():
+        while len(results_by_index) + len(pending) < limit + hedge_slots:
+            try:
+                index, (name, detail_link, image) = next(next_candidate)
+            except StopIteration:
+                return
+            # Buat task async untuk memproses detail item ini
+            pending[asyncio.create_task(process_item_guarded(name, detail_link, image))] = index
+
+    def top_ranked_ready():
+        # Selesai jika sudah ada `limit` hasil dan tidak ada item berperingkat lebih tinggi
+        # yang masih berjalan (hasil peringkat teratas selalu diutamakan).
+        if len(results_by_index) < limit:
+            return False
+        cutoff = sorted(results_by_index)[limit - 1]
+        return all(index > cutoff for index in pending.values())
+
+    launch_candidates()
+    try:
+        while pending and not top_ranked_ready():
+            timeout = None if hedge_slots else max(0.0, hedge_at - loop.time())
+            done, _ = await asyncio.wait(pending.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done and not hedge_slots:
+                logger.info(f"Results still incomplete after {ITEM_HEDGE_DELAY}s. Starting up to {ITEM_HEDGE_MARGIN} spare candidates.")
+                hedge_slots = ITEM_HEDGE_MARGIN
+            for task in done:
+                index = pending.pop(task)
+                result = task.result()
+                if result is not None:
+                    results_by_index[index] = result
+            # Item gagal -> ganti dengan kandidat berikutnya (juga mengisi slot hedge)
+            launch_candidates()
+    finally:
+        # Batalkan item yang tidak lagi dibutuhkan: yang menunggu semaphore tidak jadi
+        # berjalan, dan yang sedang berjalan melepas slot-nya. Fetch bersama yang
+        # ditinggalkan dihentikan oleh release_search_tasks di search_apps.
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.info(f"Cancelled {len(pending)} item tasks that are no longer needed.")
     
-    # Bersihkan hasil None (gagal)
-    valid_results = [r for r in results if r is not None]
+    # Bersihkan hasil None (gagal) dan kembalikan sesuai urutan hasil search
+    valid_results = [results_by_index[i] for i in sorted(results_by_index)][:limit]
     
     logger.info(f"Search request completed. Returning {len(valid_results)} valid results.")
 
@@ -450,4 +884,13 @@ async def search_apps(
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 7860))
     logger.info(f"Starting Uvicorn server on port {port}...")
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    # loop/http default ("auto") otomatis memakai uvloop + httptools jika terinstall
+    # (uvicorn[standard]), dan fallback ke asyncio/h11 jika tidak (mis. Windows).
+    # Untuk production: uvicorn main:app --workers 2 --loop uvloop --http httptools --limit-concurrency 1000
+    # (client dibuat di lifespan, jadi setiap worker punya client sendiri)
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=port,
+        timeout_keep_alive=30
+    )
\ No newline at end of file